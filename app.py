@@ -3,32 +3,102 @@ Flask application for GEO Metadata website.
 Provides a searchable interface for browsing GEO experiment metadata.
 """
 
-from flask import Flask, render_template, request, jsonify
-from database import search_entries, get_all_entries, get_entry_by_id, get_column_info, get_filter_options, search_with_filters
+import hashlib
+import os
+from pathlib import Path
+from functools import lru_cache
+
+import orjson
+from flask import Flask, Response, g, render_template, request
+from flask.json.provider import JSONProvider
+from database import DB_PATH, COLUMN_INFO, search_entries, get_all_entries, get_entry_by_id, get_filter_options, search_with_filters, rows_to_dicts
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson for faster serialization."""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+def _deploy_token():
+    """
+    Identify the deployed code and templates for ETags.
+    Uses APP_VERSION when set, otherwise the source files' modification times,
+    so every worker of one deploy agrees and a new deploy invalidates old tags.
+    """
+    version = os.environ.get('APP_VERSION')
+    if version:
+        return version
+    root = Path(__file__).parent
+    files = sorted([*root.glob('*.py'), *root.glob('templates/*.html')])
+    return ",".join(f"{path.name}:{path.stat().st_mtime_ns}" for path in files)
+
+_DEPLOY_TOKEN = _deploy_token()
+
+@app.before_request
+def check_etag():
+    """Answer 304 without running the view when the client's copy is still current."""
+    if request.endpoint == 'static' or request.method not in ('GET', 'HEAD'):
+        return None
+    
+    # Pages only change with the query string, the database file or a deploy
+    db_mtime = DB_PATH.stat().st_mtime_ns
+    key = f"{_DEPLOY_TOKEN}|{db_mtime}|{request.full_path}"
+    g.etag = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+    
+    if request.if_none_match.contains_weak(g.etag):
+        return Response(status=304)
+    return None
+
+@app.after_request
+def add_cache_headers(resp):
+    """Tag page and API responses with the ETag computed in check_etag."""
+    etag = g.get('etag')
+    if etag and resp.status_code in (200, 304):
+        resp.set_etag(etag, weak=True)
+        if request.endpoint == 'api_search':
+            resp.headers['Cache-Control'] = 'private, max-age=60'
+    return resp
 
 @app.route('/')
 def index():
     """Homepage with search interface."""
     query = request.args.get('q', '').strip()
     page = request.args.get('page', 1, type=int)
+    after_id = request.args.get('after_id', type=int)
     
     # Get filter values from request
     selected_organisms = request.args.getlist('organism')
     selected_data_types = request.args.getlist('data_type')
     selected_strategies = request.args.getlist('library_strategy')
     
+    # Rendered pages only change with these arguments or the database file
+    return _render_index(query,
+                         tuple(selected_organisms),
+                         tuple(selected_data_types),
+                         tuple(selected_strategies),
+                         page,
+                         after_id,
+                         DB_PATH.stat().st_mtime_ns)
+
+@lru_cache(maxsize=256)
+def _render_index(query, selected_organisms, selected_data_types, selected_strategies, page, after_id, db_mtime):
+    """Query and render the homepage; cached per distinct set of arguments."""
     # Build filters dict
     filters = {}
     if selected_organisms:
-        filters['organisms'] = selected_organisms
+        filters['organisms'] = list(selected_organisms)
     if selected_data_types:
-        filters['data_types'] = selected_data_types
+        filters['data_types'] = list(selected_data_types)
     if selected_strategies:
-        filters['library_strategies'] = selected_strategies
+        filters['library_strategies'] = list(selected_strategies)
     
-    data = search_with_filters(query=query, filters=filters if filters else None, page=page)
+    data = search_with_filters(query=query, filters=filters if filters else None, page=page, after_id=after_id)
     
     # Get filter options for the checkbox UI
     filter_options = get_filter_options()
@@ -36,7 +106,7 @@ def index():
     return render_template('index.html', 
                          data=data, 
                          query=query,
-                         column_info=get_column_info(),
+                         column_info=COLUMN_INFO,
                          filter_options=filter_options,
                          selected_organisms=selected_organisms,
                          selected_data_types=selected_data_types,
@@ -51,20 +121,24 @@ def entry_detail(object_id):
     
     return render_template('entry.html', 
                          entry=entry, 
-                         column_info=get_column_info())
+                         column_info=COLUMN_INFO)
 
 @app.route('/api/search')
 def api_search():
     """JSON API for search (for AJAX requests)."""
     query = request.args.get('q', '').strip()
     page = request.args.get('page', 1, type=int)
+    after_id = request.args.get('after_id', type=int)
     
     if query:
-        data = search_entries(query, page=page)
+        data = search_entries(query, page=page, after_id=after_id)
     else:
-        data = get_all_entries(page=page)
+        data = get_all_entries(page=page, after_id=after_id)
+    
+    # Rows are passed to templates as-is; JSON needs plain dicts
+    data['results'] = rows_to_dicts(data['results'])
     
-    return jsonify(data)
+    return Response(orjson.dumps(data), mimetype='application/json')
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
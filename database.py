@@ -3,175 +3,243 @@ Database utilities for Placenta Research Database.
 Provides functions to query the SQLite database.
 """
 
-import sqlite3
-from pathlib import Path
+from functools import lru_cache
+from types import MappingProxyType
 
-DB_PATH = Path(__file__).parent / "geo_metadata.db"
+from pool import DB_PATH, get_conn
 
-def get_db_connection():
-    """Create a database connection with row factory for dict-like access."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+# The trigram index cannot match anything shorter than this
+MIN_QUERY_LENGTH = 3
 
-def search_entries(query, page=1, per_page=20):
+# Full-text search clause, built once since the schema is fixed by init_db.py
+_SEARCH_WHERE_SQL = "object_id IN (SELECT rowid FROM geo_metadata_fts WHERE geo_metadata_fts MATCH ?)"
+
+# Columns needed by the result list; the detail view still loads every column
+_LIST_COLUMNS = ("object_id", "gse_id", "title", "organism", "sample_size", "data_type", "library_strategy", "submission_date")
+_LIST_SQL = ", ".join(_LIST_COLUMNS)
+
+# Column names and their display labels (read-only, shared across requests)
+COLUMN_INFO = MappingProxyType({
+    'object_id': 'Object ID',
+    'gse_id': 'GEO Series ID',
+    'data_type': 'Data Type',
+    'superseries': 'SuperSeries',
+    'sample_size': 'Sample Size',
+    'title': 'Title',
+    'organism': 'Organism',
+    'characteristics': 'Characteristics',
+    'extracted_molecule': 'Extracted Molecule',
+    'extraction_protocol': 'Extraction Protocol',
+    'library_strategy': 'Library Strategy',
+    'library_source': 'Library Source',
+    'library_selection': 'Library Selection',
+    'instrument_model': 'Instrument Model',
+    'assay_description': 'Assay Description',
+    'data_processing': 'Data Processing',
+    'platform_id': 'Platform ID',
+    'sra_study_id': 'SRA Study ID',
+    'bioproject_id': 'BioProject ID',
+    'file_types': 'File Types',
+    'submission_date': 'Submission Date',
+    'last_update_date': 'Last Update Date',
+    'organization_name': 'Organization',
+    'contact_name': 'Contact Name',
+    'email': 'Email',
+    'country': 'Country',
+    'pmid': 'PubMed ID',
+    'pmcid': 'PMC ID',
+    'doi': 'DOI',
+    'supervisor_name': 'Supervisor/PI Name',
+    'supervisor_email': 'Supervisor/PI Email',
+    'main_topic': 'Main Topic',
+    'pregnancy_trimester': 'Pregnancy Trimester',
+    'birthweight_provided': 'Birthweight Provided',
+    'ga_delivery_provided': 'GA at Delivery Provided',
+    'ga_delivery_weeks': 'GA at Delivery (weeks)',
+    'ga_collection_provided': 'GA at Collection Provided',
+    'ga_collection_weeks': 'GA at Collection (weeks)',
+    'sex_provided': 'Sex of Offspring Provided',
+    'parity_provided': 'Parity Provided',
+    'gravidity_provided': 'Gravidity Provided',
+    'offspring_number_provided': 'Offspring Number Provided',
+    'race_ethnicity_provided': 'Race/Ethnicity Provided',
+    'genetic_ancestry_provided': 'Genetic Ancestry Provided',
+    'maternal_height_provided': 'Maternal Height Provided',
+    'maternal_weight_provided': 'Maternal Weight Provided',
+    'paternal_height_provided': 'Paternal Height Provided',
+    'paternal_weight_provided': 'Paternal Weight Provided',
+    'maternal_age_provided': 'Maternal Age Provided',
+    'paternal_age_provided': 'Paternal Age Provided',
+    'pregnancy_complications_collected': 'Pregnancy Complications Collected',
+    'delivery_mode_provided': 'Delivery Mode Provided',
+    'pregnancy_complications_list': 'Pregnancy Complications',
+    'fetal_complications_listed': 'Fetal Complications Listed',
+    'fetal_complications_list': 'Fetal Complications',
+    'other_phenotypes': 'Other Phenotypes',
+    'hospital_center': 'Hospital/Center',
+    'sample_country': 'Sample Collection Country'
+})
+
+def _fts_query(query):
     """
-    Search all text fields for the query string.
-    Returns paginated results.
+    Quote a user query as a single FTS5 string.
+    Neutralizes operators such as -, : and AND so the text is matched literally.
     """
-    conn = get_db_connection()
-    offset = (page - 1) * per_page
-    
-    # Get all column names from the database
-    cursor = conn.execute("PRAGMA table_info(geo_metadata)")
-    columns = [row[1] for row in cursor.fetchall()]
-    
-    # Build search query for all text columns (exclude object_id)
-    text_columns = [col for col in columns if col != 'object_id']
-    where_clauses = [f"{col} LIKE ?" for col in text_columns]
-    where_sql = " OR ".join(where_clauses)
-    
-    search_term = f"%{query}%"
-    params = [search_term] * len(text_columns)
-    
-    # Search query
-    search_sql = f"""
-    SELECT * FROM geo_metadata
+    return '"' + query.replace('"', '""') + '"'
+
+def _short_query_result(page, per_page):
+    """Empty result with a hint, for queries too short for the trigram index."""
+    return {
+        'results': [],
+        'total': 0,
+        'page': page,
+        'per_page': per_page,
+        'total_pages': 0,
+        'next_after': None,
+        'hint': f'Type at least {MIN_QUERY_LENGTH} characters to search.'
+    }
+
+@lru_cache(maxsize=64)
+def _page_sql(where_sql, seek):
+    """
+    Build the page query for a WHERE clause.
+    Memoized so each query shape reuses one SQL string and its prepared statement.
+    """
+    if seek:
+        # Plain index seek; the total is counted separately
+        return f"""
+        SELECT {_LIST_SQL} FROM geo_metadata
+        WHERE ({where_sql}) AND object_id > ?
+        ORDER BY object_id
+        LIMIT ?
+        """
+    return f"""
+    SELECT {_LIST_SQL}, COUNT(*) OVER () AS _total FROM geo_metadata
     WHERE {where_sql}
     ORDER BY object_id
     LIMIT ? OFFSET ?
     """
+
+@lru_cache(maxsize=64)
+def _filter_where_sql(has_query, n_organisms, n_data_types, n_strategies):
+    """Build the WHERE clause for a search_with_filters shape (text search plus IN-list sizes)."""
+    where_clauses = []
     
-    results = conn.execute(search_sql, params + [per_page, offset]).fetchall()
+    # Add text search if query provided
+    if has_query:
+        where_clauses.append(_SEARCH_WHERE_SQL)
     
-    # Get total count for pagination
-    count_sql = f"SELECT COUNT(*) FROM geo_metadata WHERE {where_sql}"
-    total = conn.execute(count_sql, params).fetchone()[0]
-    conn.close()
+    # Add filters
+    if n_organisms:
+        where_clauses.append(f"organism IN ({','.join('?' * n_organisms)})")
+    if n_data_types:
+        where_clauses.append(f"data_type IN ({','.join('?' * n_data_types)})")
+    if n_strategies:
+        where_clauses.append(f"library_strategy IN ({','.join('?' * n_strategies)})")
     
-    return {
-        'results': [dict(row) for row in results],
-        'total': total,
-        'page': page,
-        'per_page': per_page,
-        'total_pages': (total + per_page - 1) // per_page
-    }
+    return " AND ".join(where_clauses) if where_clauses else "1=1"
 
-def get_all_entries(page=1, per_page=20):
-    """Get all entries with pagination."""
-    conn = get_db_connection()
-    offset = (page - 1) * per_page
+@lru_cache(maxsize=256)
+def _count_matches(where_sql, params, db_mtime):
+    """Count the rows matching a WHERE clause; db_mtime only serves as the cache key."""
+    with get_conn() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM geo_metadata WHERE {where_sql}", params).fetchone()[0]
+
+def _paginate(where_sql, params, page, per_page, after_id=None):
+    """
+    Run a paginated query against geo_metadata, returning sqlite3.Row results.
+    With after_id, seeks past the previous page on object_id instead of using OFFSET.
+    Offset pages get the total match count from a window function in the same pass.
+    Seeks count the full WHERE clause separately, cached until the database file changes.
+    """
+    skipped = (page - 1) * per_page
+    search_sql = _page_sql(where_sql, after_id is not None)
+    
+    if after_id is not None:
+        search_params = params + [after_id, per_page]
+    else:
+        search_params = params + [per_page, skipped]
     
-    results = conn.execute(
-        "SELECT * FROM geo_metadata ORDER BY object_id LIMIT ? OFFSET ?",
-        [per_page, offset]
-    ).fetchall()
+    with get_conn() as conn:
+        rows = conn.execute(search_sql, search_params).fetchall()
     
-    total = conn.execute("SELECT COUNT(*) FROM geo_metadata").fetchone()[0]
-    conn.close()
+    if after_id is None and rows:
+        total = rows[0]['_total']
+    elif after_id is None and skipped <= 0:
+        total = 0
+    else:
+        # Seeks have no window count, and past the last page there is no row to carry one
+        total = _count_matches(where_sql, tuple(params), DB_PATH.stat().st_mtime_ns)
     
     return {
-        'results': [dict(row) for row in results],
+        'results': rows,
         'total': total,
         'page': page,
         'per_page': per_page,
-        'total_pages': (total + per_page - 1) // per_page
+        'total_pages': (total + per_page - 1) // per_page,
+        'next_after': rows[-1]['object_id'] if rows else None
     }
 
+def search_entries(query, page=1, per_page=20, after_id=None):
+    """
+    Search all text fields for the query string.
+    Returns paginated results.
+    """
+    if not query:
+        return get_all_entries(page, per_page, after_id)
+    if len(query) < MIN_QUERY_LENGTH:
+        return _short_query_result(page, per_page)
+    
+    # Match against the full-text index instead of scanning every column
+    return _paginate(_SEARCH_WHERE_SQL, [_fts_query(query)], page, per_page, after_id)
+
+def get_all_entries(page=1, per_page=20, after_id=None):
+    """Get all entries with pagination."""
+    return _paginate("1=1", [], page, per_page, after_id)
+
 def get_entry_by_id(object_id):
     """Get a single entry by its object_id."""
-    conn = get_db_connection()
-    result = conn.execute(
-        "SELECT * FROM geo_metadata WHERE object_id = ?",
-        [object_id]
-    ).fetchone()
-    conn.close()
+    with get_conn() as conn:
+        result = conn.execute(
+            "SELECT * FROM geo_metadata WHERE object_id = ?",
+            [object_id]
+        ).fetchone()
     
-    return dict(result) if result else None
+    return result
+
+def rows_to_dicts(rows):
+    """Convert sqlite3.Row results to plain dicts for JSON, dropping the internal _total column."""
+    return [{key: row[key] for key in row.keys() if key != '_total'} for row in rows]
 
 def get_column_info():
     """Get column names and their display labels."""
-    return {
-        'object_id': 'Object ID',
-        'gse_id': 'GEO Series ID',
-        'data_type': 'Data Type',
-        'superseries': 'SuperSeries',
-        'sample_size': 'Sample Size',
-        'title': 'Title',
-        'organism': 'Organism',
-        'characteristics': 'Characteristics',
-        'extracted_molecule': 'Extracted Molecule',
-        'extraction_protocol': 'Extraction Protocol',
-        'library_strategy': 'Library Strategy',
-        'library_source': 'Library Source',
-        'library_selection': 'Library Selection',
-        'instrument_model': 'Instrument Model',
-        'assay_description': 'Assay Description',
-        'data_processing': 'Data Processing',
-        'platform_id': 'Platform ID',
-        'sra_study_id': 'SRA Study ID',
-        'bioproject_id': 'BioProject ID',
-        'file_types': 'File Types',
-        'submission_date': 'Submission Date',
-        'last_update_date': 'Last Update Date',
-        'organization_name': 'Organization',
-        'contact_name': 'Contact Name',
-        'email': 'Email',
-        'country': 'Country',
-        'pmid': 'PubMed ID',
-        'pmcid': 'PMC ID',
-        'doi': 'DOI',
-        'supervisor_name': 'Supervisor/PI Name',
-        'supervisor_email': 'Supervisor/PI Email',
-        'main_topic': 'Main Topic',
-        'pregnancy_trimester': 'Pregnancy Trimester',
-        'birthweight_provided': 'Birthweight Provided',
-        'ga_delivery_provided': 'GA at Delivery Provided',
-        'ga_delivery_weeks': 'GA at Delivery (weeks)',
-        'ga_collection_provided': 'GA at Collection Provided',
-        'ga_collection_weeks': 'GA at Collection (weeks)',
-        'sex_provided': 'Sex of Offspring Provided',
-        'parity_provided': 'Parity Provided',
-        'gravidity_provided': 'Gravidity Provided',
-        'offspring_number_provided': 'Offspring Number Provided',
-        'race_ethnicity_provided': 'Race/Ethnicity Provided',
-        'genetic_ancestry_provided': 'Genetic Ancestry Provided',
-        'maternal_height_provided': 'Maternal Height Provided',
-        'maternal_weight_provided': 'Maternal Weight Provided',
-        'paternal_height_provided': 'Paternal Height Provided',
-        'paternal_weight_provided': 'Paternal Weight Provided',
-        'maternal_age_provided': 'Maternal Age Provided',
-        'paternal_age_provided': 'Paternal Age Provided',
-        'pregnancy_complications_collected': 'Pregnancy Complications Collected',
-        'delivery_mode_provided': 'Delivery Mode Provided',
-        'pregnancy_complications_list': 'Pregnancy Complications',
-        'fetal_complications_listed': 'Fetal Complications Listed',
-        'fetal_complications_list': 'Fetal Complications',
-        'other_phenotypes': 'Other Phenotypes',
-        'hospital_center': 'Hospital/Center',
-        'sample_country': 'Sample Collection Country'
-    }
+    return COLUMN_INFO
 
 def get_filter_options():
-    """Get unique values for filter dropdowns."""
-    conn = get_db_connection()
-    
-    # Get unique organisms
-    organisms = conn.execute(
-        "SELECT DISTINCT organism FROM geo_metadata WHERE organism IS NOT NULL AND organism != '' ORDER BY organism"
-    ).fetchall()
-    
-    # Get unique data types
-    data_types = conn.execute(
-        "SELECT DISTINCT data_type FROM geo_metadata WHERE data_type IS NOT NULL AND data_type != '' ORDER BY data_type"
-    ).fetchall()
-    
-    # Get unique library strategies
-    strategies = conn.execute(
-        "SELECT DISTINCT library_strategy FROM geo_metadata WHERE library_strategy IS NOT NULL AND library_strategy != '' ORDER BY library_strategy"
-    ).fetchall()
-    
-    conn.close()
+    """
+    Get unique values for filter dropdowns.
+    Cached until the database file's modification time changes.
+    """
+    return _load_filter_options(DB_PATH.stat().st_mtime_ns)
+
+@lru_cache(maxsize=1)
+def _load_filter_options(db_mtime):
+    """Query the filter values; db_mtime only serves as the cache key."""
+    with get_conn() as conn:
+        # Get unique organisms
+        organisms = conn.execute(
+            "SELECT DISTINCT organism FROM geo_metadata WHERE organism IS NOT NULL AND organism != '' ORDER BY organism"
+        ).fetchall()
+        
+        # Get unique data types
+        data_types = conn.execute(
+            "SELECT DISTINCT data_type FROM geo_metadata WHERE data_type IS NOT NULL AND data_type != '' ORDER BY data_type"
+        ).fetchall()
+        
+        # Get unique library strategies
+        strategies = conn.execute(
+            "SELECT DISTINCT library_strategy FROM geo_metadata WHERE library_strategy IS NOT NULL AND library_strategy != '' ORDER BY library_strategy"
+        ).fetchall()
     
     return {
         'organisms': [row[0] for row in organisms],
@@ -179,59 +247,18 @@ def get_filter_options():
         'library_strategies': [row[0] for row in strategies]
     }
 
-def search_with_filters(query=None, filters=None, page=1, per_page=20):
+def search_with_filters(query=None, filters=None, page=1, per_page=20, after_id=None):
     """Search with optional filters."""
-    conn = get_db_connection()
-    offset = (page - 1) * per_page
+    if query and len(query) < MIN_QUERY_LENGTH:
+        return _short_query_result(page, per_page)
     
-    where_clauses = []
-    params = []
+    filters = filters or {}
+    organisms = list(filters.get('organisms') or [])
+    data_types = list(filters.get('data_types') or [])
+    strategies = list(filters.get('library_strategies') or [])
     
-    # Add text search if query provided
-    if query:
-        cursor = conn.execute("PRAGMA table_info(geo_metadata)")
-        columns = [row[1] for row in cursor.fetchall()]
-        text_columns = [col for col in columns if col != 'object_id']
-        search_clauses = [f"{col} LIKE ?" for col in text_columns]
-        where_clauses.append(f"({' OR '.join(search_clauses)})")
-        params.extend([f"%{query}%"] * len(text_columns))
-    
-    # Add filters
-    if filters:
-        if 'organisms' in filters and filters['organisms']:
-            placeholders = ','.join(['?' for _ in filters['organisms']])
-            where_clauses.append(f"organism IN ({placeholders})")
-            params.extend(filters['organisms'])
-        if 'data_types' in filters and filters['data_types']:
-            placeholders = ','.join(['?' for _ in filters['data_types']])
-            where_clauses.append(f"data_type IN ({placeholders})")
-            params.extend(filters['data_types'])
-        if 'library_strategies' in filters and filters['library_strategies']:
-            placeholders = ','.join(['?' for _ in filters['library_strategies']])
-            where_clauses.append(f"library_strategy IN ({placeholders})")
-            params.extend(filters['library_strategies'])
-    
-    # Build query
-    where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
-    
-    search_sql = f"""
-    SELECT * FROM geo_metadata
-    WHERE {where_sql}
-    ORDER BY object_id
-    LIMIT ? OFFSET ?
-    """
-    
-    results = conn.execute(search_sql, params + [per_page, offset]).fetchall()
+    params = [_fts_query(query)] if query else []
+    params.extend(organisms + data_types + strategies)
     
-    # Get total count
-    count_sql = f"SELECT COUNT(*) FROM geo_metadata WHERE {where_sql}"
-    total = conn.execute(count_sql, params).fetchone()[0]
-    conn.close()
-    
-    return {
-        'results': [dict(row) for row in results],
-        'total': total,
-        'page': page,
-        'per_page': per_page,
-        'total_pages': (total + per_page - 1) // per_page
-    }
+    where_sql = _filter_where_sql(bool(query), len(organisms), len(data_types), len(strategies))
+    return _paginate(where_sql, params, page, per_page, after_id)
@@ -1,12 +1,14 @@
 """
 Initialize the SQLite database from the Excel file.
-Adds object_id column as unique identifier for each entry.
+Each entry gets an object_id (its SQLite rowid) as unique identifier.
 """
 
+import os
 import sqlite3
-import pandas as pd
 from pathlib import Path
 
+import openpyxl
+
 # Paths
 EXCEL_PATH = Path(__file__).parent.parent / "R_Scripts" / "gse_metadata_full.xlsx"
 DB_PATH = Path(__file__).parent / "geo_metadata.db"
@@ -43,28 +45,73 @@ COLUMN_MAPPING = {
     'DOI': 'doi'
 }
 
+def database_files(path):
+    """The database file followed by the journal and WAL sidecars SQLite may leave beside it."""
+    return [path] + [path.with_name(path.name + suffix) for suffix in ("-journal", "-wal", "-shm")]
+
+def create_search_index(conn):
+    """Create the FTS5 full-text index over all text columns, kept in sync by triggers."""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(geo_metadata)") if row[1] != 'object_id']
+    column_sql = ", ".join(columns)
+    new_sql = ", ".join(f"new.{col}" for col in columns)
+    old_sql = ", ".join(f"old.{col}" for col in columns)
+    
+    # Trigram tokenizer keeps the substring matching of the old LIKE '%q%' search
+    conn.execute(f"""
+    CREATE VIRTUAL TABLE geo_metadata_fts USING fts5(
+        {column_sql},
+        content='geo_metadata', content_rowid='object_id', tokenize='trigram'
+    )
+    """)
+    conn.execute("INSERT INTO geo_metadata_fts(geo_metadata_fts) VALUES('rebuild')")
+    
+    # Mirror future changes to geo_metadata into the index
+    conn.execute(f"""
+    CREATE TRIGGER geo_metadata_ai AFTER INSERT ON geo_metadata BEGIN
+        INSERT INTO geo_metadata_fts(rowid, {column_sql}) VALUES (new.object_id, {new_sql});
+    END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER geo_metadata_ad AFTER DELETE ON geo_metadata BEGIN
+        INSERT INTO geo_metadata_fts(geo_metadata_fts, rowid, {column_sql}) VALUES ('delete', old.object_id, {old_sql});
+    END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER geo_metadata_au AFTER UPDATE ON geo_metadata BEGIN
+        INSERT INTO geo_metadata_fts(geo_metadata_fts, rowid, {column_sql}) VALUES ('delete', old.object_id, {old_sql});
+        INSERT INTO geo_metadata_fts(rowid, {column_sql}) VALUES (new.object_id, {new_sql});
+    END
+    """)
+    print("Created geo_metadata_fts search index")
+
 def init_database():
     """Initialize the database from Excel file."""
     print(f"Reading Excel file: {EXCEL_PATH}")
-    df = pd.read_excel(EXCEL_PATH)
-    
-    print(f"Found {len(df)} entries with {len(df.columns)} columns")
+    # Stream rows from the sheet instead of loading it all into memory
+    wb = openpyxl.load_workbook(EXCEL_PATH, read_only=True, data_only=True)
+    rows = wb.active.iter_rows(values_only=True)
     
     # Rename columns to SQLite-friendly names
-    df = df.rename(columns=COLUMN_MAPPING)
+    header = next(rows)
+    columns = [COLUMN_MAPPING.get(name, name) for name in header]
     
-    # Add object_id as the first column (1-indexed for user friendliness)
-    df.insert(0, 'object_id', range(1, len(df) + 1))
+    print(f"Found {len(columns)} columns")
     
-    print(f"Added object_id column (1 to {len(df)})")
-    
-    # Remove existing database if it exists
-    if DB_PATH.exists():
-        DB_PATH.unlink()
-        print(f"Removed existing database")
+    # Build into a temporary file and swap it in at the end, so a running
+    # server never opens a half-built database
+    build_path = DB_PATH.with_name(DB_PATH.name + ".tmp")
+    for path in database_files(build_path):
+        path.unlink(missing_ok=True)
     
     # Create SQLite database
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(build_path)
+    
+    # Configure the file before the first table is created (page_size is fixed after that)
+    conn.execute("PRAGMA page_size=8192")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.execute("PRAGMA mmap_size=268435456")
     
     # Create table with proper schema
     create_table_sql = """
@@ -97,28 +144,106 @@ def init_database():
         country TEXT,
         pmid REAL,
         pmcid TEXT,
-        doi TEXT
+        doi TEXT,
+        supervisor_name TEXT,
+        supervisor_email TEXT,
+        main_topic TEXT,
+        pregnancy_trimester TEXT,
+        birthweight_provided TEXT,
+        ga_delivery_provided TEXT,
+        ga_delivery_weeks TEXT,
+        ga_collection_provided TEXT,
+        ga_collection_weeks TEXT,
+        sex_provided TEXT,
+        parity_provided TEXT,
+        gravidity_provided TEXT,
+        offspring_number_provided TEXT,
+        race_ethnicity_provided TEXT,
+        genetic_ancestry_provided TEXT,
+        maternal_height_provided TEXT,
+        maternal_weight_provided TEXT,
+        paternal_height_provided TEXT,
+        paternal_weight_provided TEXT,
+        maternal_age_provided TEXT,
+        paternal_age_provided TEXT,
+        pregnancy_complications_collected TEXT,
+        delivery_mode_provided TEXT,
+        pregnancy_complications_list TEXT,
+        fetal_complications_listed TEXT,
+        fetal_complications_list TEXT,
+        other_phenotypes TEXT,
+        hospital_center TEXT,
+        sample_country TEXT
     )
     """
     
     conn.execute(create_table_sql)
     print("Created geo_metadata table")
     
-    # Insert data
-    df.to_sql('geo_metadata', conn, if_exists='replace', index=False)
+    # Only load spreadsheet columns that exist in the schema
+    table_columns = {row[1] for row in conn.execute("PRAGMA table_info(geo_metadata)")}
+    col_idx = [i for i, name in enumerate(columns) if name in table_columns]
+    skipped = [name for name in columns if name not in table_columns]
+    if skipped:
+        print(f"Skipping columns not in schema: {skipped}")
+    
+    insert_columns = ", ".join(columns[i] for i in col_idx)
+    placeholders = ", ".join("?" for _ in col_idx)
+    insert_sql = f"INSERT INTO geo_metadata({insert_columns}) VALUES ({placeholders})"
+    
+    # Skip blank spreadsheet rows
+    data_rows = (row for row in rows if any(value is not None for value in row))
+    
+    # Insert data in a single transaction; object_id is an INTEGER PRIMARY KEY,
+    # so SQLite numbers the rows 1 to N in insertion order
+    with conn:
+        cursor = conn.executemany(
+            insert_sql,
+            ([row[j] for j in col_idx] for row in data_rows)
+        )
+    total = cursor.rowcount
+    wb.close()
+    
+    print(f"Inserted {total} entries (object_id 1 to {total})")
+    
+    # Build full-text search index
+    create_search_index(conn)
     
     # Create index for faster searching
     conn.execute("CREATE INDEX idx_gse_id ON geo_metadata(gse_id)")
+    # Not redundant with idx_filters: its implicit object_id suffix keeps an
+    # organism-only filter in page order, where idx_filters would interpose
+    # data_type and library_strategy and force a scan or sort
     conn.execute("CREATE INDEX idx_organism ON geo_metadata(organism)")
     conn.execute("CREATE INDEX idx_title ON geo_metadata(title)")
     
+    # Indexes for the category filters; idx_filters also covers the object_id sort
+    conn.execute("CREATE INDEX idx_data_type ON geo_metadata(data_type)")
+    conn.execute("CREATE INDEX idx_library_strategy ON geo_metadata(library_strategy)")
+    conn.execute("CREATE INDEX idx_filters ON geo_metadata(organism, data_type, library_strategy, object_id)")
+    
+    # Gather query planner statistics for the new table and indexes
+    conn.execute("PRAGMA analysis_limit=1000")
+    conn.execute("ANALYZE")
+    
     conn.commit()
+    
+    # Ship in rollback-journal mode: a WAL file cannot be opened from read-only storage
+    conn.execute("PRAGMA journal_mode=DELETE")
     conn.close()
     
+    # Old sidecar files would otherwise be applied to the new database
+    existed = DB_PATH.exists()
+    for path in database_files(DB_PATH)[1:]:
+        path.unlink(missing_ok=True)
+    os.replace(build_path, DB_PATH)
+    if existed:
+        print("Replaced existing database")
+    
     print(f"Database created successfully at: {DB_PATH}")
-    print(f"Total entries: {len(df)}")
+    print(f"Total entries: {total}")
     
-    return len(df)
+    return total
 
 if __name__ == "__main__":
     init_database()
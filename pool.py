@@ -0,0 +1,135 @@
+"""
+Connection pool for Placenta Research Database.
+Reuses read-only SQLite connections across requests so each keeps its page cache warm.
+Set DB_IN_MEMORY=1 to serve reads from an in-memory copy of the database file.
+"""
+
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent / "geo_metadata.db"
+_DISK_URI = f"{DB_PATH.resolve().as_uri()}?mode=ro"
+
+# Serve reads from RAM instead of the file (for deployments with memory to spare)
+IN_MEMORY = os.environ.get("DB_IN_MEMORY") == "1"
+
+# Maximum number of idle connections kept open
+POOL_SIZE = 5
+
+# Per-connection settings applied when a connection is opened
+CONNECTION_PRAGMAS = [
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA mmap_size=268435456",
+]
+
+# Idle connections, stored as (source, connection); a source starts with its URI
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+
+# Current in-memory copy; the holder connection keeps it alive between requests
+_memory_lock = threading.Lock()
+_memory_uri = None
+_memory_file = None
+_memory_holder = None
+_memory_loads = 0
+
+def _disk_source():
+    """Identify the database file so connections to a replaced or rewritten file are not reused."""
+    stat = DB_PATH.stat()
+    return (_DISK_URI, stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+
+def _close_idle():
+    """Close every idle pooled connection."""
+    while True:
+        try:
+            _pool.get_nowait()[1].close()
+        except queue.Empty:
+            break
+
+def _memory_source():
+    """Return the URI of the in-memory copy, reloading it when the file changes on disk."""
+    global _memory_uri, _memory_file, _memory_holder, _memory_loads
+    disk_file = _disk_source()
+    if disk_file == _memory_file:
+        return _memory_uri
+
+    with _memory_lock:
+        if disk_file != _memory_file:
+            # A new name per load lets connections on the previous copy finish undisturbed
+            _memory_loads += 1
+            uri = f"file:geo_metadata_{_memory_loads}?mode=memory&cache=shared"
+            holder = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            disk = sqlite3.connect(_DISK_URI, uri=True)
+            try:
+                disk.backup(holder)
+            finally:
+                disk.close()
+
+            previous = _memory_holder
+            _memory_uri, _memory_holder = uri, holder
+            _memory_file = disk_file
+
+            # Idle connections would each keep an old copy alive
+            _close_idle()
+            if previous is not None:
+                previous.close()
+
+    return _memory_uri
+
+def create_connection(source=_DISK_URI):
+    """Open a read-only connection with row factory for dict-like access."""
+    conn = sqlite3.connect(source, uri=True, check_same_thread=False, cached_statements=256)
+    conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    if source != _DISK_URI:
+        # In-memory copies cannot be opened with mode=ro
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+@contextmanager
+def get_conn():
+    """
+    Borrow a connection from the pool for the duration of a with-block.
+    Opens a new connection when none are idle; extras are closed on return.
+    """
+    source = (_memory_source(),) if IN_MEMORY else _disk_source()
+    conn = None
+    try:
+        pooled_source, pooled = _pool.get_nowait()
+    except queue.Empty:
+        pass
+    else:
+        if pooled_source == source:
+            conn = pooled
+        else:
+            # The file changed (or the in-memory copy was reloaded) since this
+            # connection was opened, so every idle connection is stale
+            pooled.close()
+            _close_idle()
+
+    if conn is None:
+        conn = create_connection(source[0])
+
+    try:
+        yield conn
+    finally:
+        try:
+            _pool.put_nowait((source, conn))
+        except queue.Full:
+            conn.close()
+
+def close_all():
+    """Close idle pooled connections on shutdown."""
+    _close_idle()
+
+    if _memory_holder is not None:
+        _memory_holder.close()
+
+atexit.register(close_all)